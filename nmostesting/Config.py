@@ -57,6 +57,11 @@ CACHE_PATH = 'cache'
 # Timeout for any HTTP requests
 HTTP_TIMEOUT = 1
 
+# Maximum number of HTTP requests to perform concurrently, e.g. when running the automatically defined API tests
+# or gathering the resources to be tested.
+# 1 = perform these requests one at a time
+MAX_CONCURRENT_REQUESTS = 8
+
 # Restrict the maximum number of resources that time consuming tests run against.
 # 0 = unlimited for a really thorough test!
 MAX_TEST_ITERATIONS = 0
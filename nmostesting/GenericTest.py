@@ -13,12 +13,15 @@
 # limitations under the License.
 
 import os
-from requests.compat import json
+import orjson
 import git
 import jsonschema
+import fastjsonschema
 import traceback
 import inspect
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from . import TestHelper
 from .Specification import Specification
@@ -28,6 +31,15 @@ from . import Config as CONFIG
 
 NMOS_WIKI_URL = "https://github.com/AMWA-TV/nmos/wiki"
 
+# Formats which are checked when validating payloads against a schema
+FORMAT_CHECKER = jsonschema.FormatChecker(["ipv4", "ipv6", "uri"])
+
+# Make compiled validators check exactly the same formats as FORMAT_CHECKER, and no others
+COMPILED_FORMATS = {format_name: (lambda value: True) for format_name in ["date-time", "email", "hostname", "regex"]}
+COMPILED_FORMATS.update({format_name: (lambda value, format_name=format_name:
+                                       FORMAT_CHECKER.conforms(value, format_name))
+                         for format_name in FORMAT_CHECKER.checkers})
+
 
 def test_depends(func):
     """Decorator to prevent a test being executed in individual mode"""
@@ -61,6 +73,10 @@ class GenericTest(object):
     def __init__(self, apis, omit_paths=None, disable_auto=False):
         self.apis = apis
         self.saved_entities = {}
+        self.saved_entities_lock = threading.Lock()
+        self.validators = {}
+        self.compiled_validators = {}
+        self.error_schema = None
         self.auto_test_count = 0
         self.test_individual = False
         self.result = list()
@@ -97,12 +113,18 @@ class GenericTest(object):
 
             api_data["spec_branch"] = spec_branch
 
-            repo.git.reset('--hard')
-            repo.git.checkout(spec_branch)
+            # Only discard local changes (such as RAML fixes) and switch branch when required
+            if repo.head.is_detached or repo.active_branch.name != spec_branch or repo.is_dirty():
+                repo.head.reset(index=True, working_tree=True)
+                repo.git.checkout(spec_branch)
             repo.git.rebase("origin/" + spec_branch)
 
         self.parse_RAML()
 
+        # Manually defined tests, in the (alphabetical) order that they are run
+        self.test_methods = [method_name for method_name in dir(type(self))
+                             if method_name.startswith("test_") and callable(getattr(type(self), method_name))]
+
         self.result.append(test.NA(""))
 
     def parse_RAML(self):
@@ -113,6 +135,11 @@ class GenericTest(object):
             raml_path = os.path.join(self.apis[api]["spec_path"] + '/APIs/' + self.apis[api]["raml"])
             self.apis[api]["spec"] = Specification(raml_path)
 
+            # Prefixes used to construct the URL and name of each automatically defined test
+            if self.apis[api]["url"] is not None:
+                self.apis[api]["url_prefix"] = self.apis[api]["url"].rstrip("/")
+            self.apis[api]["test_path_prefix"] = "/x-nmos/{}/{}".format(api, self.apis[api]["version"])
+
     def execute_tests(self, test_names):
         """Perform tests defined within this class"""
 
@@ -130,18 +157,16 @@ class GenericTest(object):
 
         # Run manually defined tests
         if test_name == "all":
-            for method_name in dir(self):
-                if method_name.startswith("test_"):
-                    method = getattr(self, method_name)
-                    if callable(method):
-                        print(" * Running " + method_name)
-                        test = Test(inspect.getdoc(method), method_name)
-                        try:
-                            self.result.append(method(test))
-                        except NMOSTestException as e:
-                            self.result.append(e.args[0])
-                        except Exception as e:
-                            self.result.append(self.uncaught_exception(method_name, e))
+            for method_name in self.test_methods:
+                method = getattr(self, method_name)
+                print(" * Running " + method_name)
+                test = Test(inspect.getdoc(method), method_name)
+                try:
+                    self.result.append(method(test))
+                except NMOSTestException as e:
+                    self.result.append(e.args[0])
+                except Exception as e:
+                    self.result.append(self.uncaught_exception(method_name, e))
 
         # Run a single test
         if test_name != "auto" and test_name != "all":
@@ -201,9 +226,9 @@ class GenericTest(object):
         if isinstance(data, bytes):
             return data.decode('ascii')
         if isinstance(data, dict):
-            return dict(map(self.convert_bytes, data.items()))
+            return {self.convert_bytes(key): self.convert_bytes(value) for key, value in data.items()}
         if isinstance(data, tuple):
-            return map(self.convert_bytes, data)
+            return tuple(map(self.convert_bytes, data))
         return data
 
     def prepare_CORS(self, method, request_headers):
@@ -219,29 +244,31 @@ class GenericTest(object):
         if 'Access-Control-Allow-Origin' not in headers:
             return False, "'Access-Control-Allow-Origin' not in CORS headers: {}".format(headers)
         if method.upper() == "OPTIONS" and expect_headers is not None:
-            if 'Access-Control-Allow-Headers' not in headers:
+            allow_headers = headers.get('Access-Control-Allow-Headers')
+            if allow_headers is None:
                 return False, "'Access-Control-Allow-Headers' not in CORS headers: {}".format(headers)
-            current_headers = [x.strip().upper() for x in headers['Access-Control-Allow-Headers'].split(",")]
+            current_headers = {x.strip().upper() for x in allow_headers.split(",")}
             for cors_header in expect_headers:
                 if cors_header.upper() not in current_headers:
                     return False, "'{}' not in 'Access-Control-Allow-Headers' CORS header: {}" \
-                                  .format(cors_header, headers['Access-Control-Allow-Headers'])
+                                  .format(cors_header, allow_headers)
         if method.upper() == "OPTIONS" and expect_methods is not None:
-            if 'Access-Control-Allow-Methods' not in headers:
+            allow_methods = headers.get('Access-Control-Allow-Methods')
+            if allow_methods is None:
                 return False, "'Access-Control-Allow-Methods' not in CORS headers: {}".format(headers)
-            current_methods = [x.strip().upper() for x in headers['Access-Control-Allow-Methods'].split(",")]
+            current_methods = {x.strip().upper() for x in allow_methods.split(",")}
             for cors_method in expect_methods:
                 if cors_method.upper() not in current_methods:
                     return False, "'{}' not in 'Access-Control-Allow-Methods' CORS header: {}" \
-                                  .format(cors_method, headers['Access-Control-Allow-Methods'])
+                                  .format(cors_method, allow_methods)
         return True, ""
 
     def check_content_type(self, headers, expected_type="application/json"):
         """Check the Content-Type header of an API request or response"""
-        if "Content-Type" not in headers:
+        ctype = headers.get("Content-Type")
+        if ctype is None:
             return False, "API failed to signal a Content-Type."
         else:
-            ctype = headers["Content-Type"]
             ctype_params = ctype.split(";")
             if ctype_params[0] != expected_type:
                 return False, "API signalled a Content-Type of {} rather than {}." \
@@ -311,11 +338,12 @@ class GenericTest(object):
             if not cors_valid:
                 return test.FAIL(cors_message)
             try:
-                if not isinstance(response.json(), list) or expectation not in response.json():
+                response_json = orjson.loads(response.content)
+                if not isinstance(response_json, list) or expectation not in response_json:
                     return test.FAIL("Response is not an array containing '{}'".format(expectation))
                 else:
                     return test.PASS()
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 return test.FAIL("Non-JSON response returned")
 
     def check_response(self, schema, method, response):
@@ -329,20 +357,21 @@ class GenericTest(object):
             return False, cors_message
 
         try:
-            self.validate_schema(response.json(), schema)
+            self.validate_schema(orjson.loads(response.content), schema)
         except jsonschema.ValidationError:
             return False, "Response schema validation error"
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             return False, "Invalid JSON received"
 
         return True, ctype_message
 
     def check_error_response(self, method, response, code):
         """Confirm that a given Requests response conforms to the 4xx/5xx error schema and has any expected headers"""
-        schema = TestHelper.load_resolved_schema("test_data/core", "error.json", path_prefix=False)
-        valid, message = self.check_response(schema, method, response)
+        if self.error_schema is None:
+            self.error_schema = TestHelper.load_resolved_schema("test_data/core", "error.json", path_prefix=False)
+        valid, message = self.check_response(self.error_schema, method, response)
         if valid:
-            if response.json()["code"] != code:
+            if orjson.loads(response.content)["code"] != code:
                 return False, "Error JSON 'code' was not set to {}".format(code)
             return True, ""
         else:
@@ -353,8 +382,58 @@ class GenericTest(object):
         Validate the payload under the given schema.
         Raises an exception if the payload (or schema itself) is invalid
         """
-        checker = jsonschema.FormatChecker(["ipv4", "ipv6", "uri"])
-        jsonschema.validate(payload, schema, format_checker=checker)
+        # Schemas are only worth compiling once they are seen to be used repeatedly
+        cached_schema = self.validators.get(id(schema), (None, None))[0]
+        if cached_schema is schema:
+            compiled_validator = self.get_compiled_validator(schema)
+            if compiled_validator is not None:
+                try:
+                    compiled_validator(payload)
+                    return
+                except fastjsonschema.JsonSchemaValueException:
+                    # Fall through in order to report the error in the same way as jsonschema
+                    pass
+
+        validator = self.get_validator(schema)
+        error = jsonschema.exceptions.best_match(validator.iter_errors(payload))
+        if error is not None:
+            raise error
+
+    def get_validator(self, schema):
+        """
+        Get a validator for the given schema, checking the schema itself is valid when first encountered.
+        Validators are cached by schema object, which is stored alongside so that its id cannot be reused.
+        """
+        try:
+            cached_schema, validator = self.validators[id(schema)]
+            if cached_schema is schema:
+                return validator
+        except KeyError:
+            pass
+        cls = jsonschema.validators.validator_for(schema)
+        cls.check_schema(schema)
+        validator = cls(schema, format_checker=FORMAT_CHECKER)
+        self.validators[id(schema)] = (schema, validator)
+        return validator
+
+    def get_compiled_validator(self, schema):
+        """
+        Get a validation function generated by fastjsonschema for the given schema, or None if it can't be compiled.
+        Compiled validators are cached in the same way as those returned by get_validator.
+        """
+        try:
+            cached_schema, compiled_validator = self.compiled_validators[id(schema)]
+            if cached_schema is schema:
+                return compiled_validator
+        except KeyError:
+            pass
+        try:
+            compiled_validator = fastjsonschema.compile(schema, formats=COMPILED_FORMATS, use_default=False)
+        except (fastjsonschema.JsonSchemaDefinitionException, RecursionError):
+            # For example, schemas which reference themselves can't be compiled
+            compiled_validator = None
+        self.compiled_validators[id(schema)] = (schema, compiled_validator)
+        return compiled_validator
 
     def do_request(self, method, url, **kwargs):
         return TestHelper.do_request(method=method, url=url, **kwargs)
@@ -378,14 +457,28 @@ class GenericTest(object):
             results.append(self.do_test_base_path(api, self.apis[api]["base_url"], "/x-nmos/{}".format(api),
                                                   self.apis[api]["version"] + "/"))
 
+            # Test names are allocated up front so that they are numbered in order of the resources
+            auto_tests = []
             for resource in self.apis[api]["spec"].get_reads():
                 for response_code in resource[1]['responses']:
                     if response_code == 200 and resource[0] not in self.omit_paths:
+                        # URLs with multiple parameters are not tested automatically
+                        if resource[1]['params'] and len(resource[1]['params']) > 1:
+                            continue
                         # TODO: Test for each of these if the trailing slash version also works and if redirects are
                         # used on either.
-                        result = self.do_test_api_resource(resource, response_code, api)
-                        if result is not None:
-                            results.append(result)
+                        auto_tests.append((resource, response_code, api, self.auto_test_name(api)))
+
+            # Requests are made concurrently, but resources without parameters must all be tested first as their
+            # responses provide the saved entities used to test parameterised URLs
+            auto_results = {}
+            with ThreadPoolExecutor(max_workers=CONFIG.MAX_CONCURRENT_REQUESTS) as executor:
+                for parameterised in [False, True]:
+                    group = [auto_test for auto_test in auto_tests if bool(auto_test[0][1]['params']) == parameterised]
+                    group_results = executor.map(lambda auto_test: self.do_test_api_resource(*auto_test), group)
+                    for auto_test, result in zip(group, group_results):
+                        auto_results[auto_test[3]] = result
+            results += [auto_results[auto_test[3]] for auto_test in auto_tests]
 
             # Perform an automatic check for an error condition
             results.append(self.do_test_404_path(api))
@@ -396,8 +489,8 @@ class GenericTest(object):
         api = self.apis[api_name]
         error_code = 404
         invalid_path = str(uuid.uuid4())
-        url = "{}/{}".format(api["url"].rstrip("/"), invalid_path)
-        test = Test("GET /x-nmos/{}/{}/{} ({})".format(api_name, api["version"], invalid_path, error_code),
+        url = "{}/{}".format(api["url_prefix"], invalid_path)
+        test = Test("GET {}/{} ({})".format(api["test_path_prefix"], invalid_path, error_code),
                     self.auto_test_name(api_name))
 
         valid, response = self.do_request("GET", url)
@@ -413,37 +506,39 @@ class GenericTest(object):
         else:
             return test.FAIL(message)
 
-    def do_test_api_resource(self, resource, response_code, api):
+    def do_test_api_resource(self, resource, response_code, api, test_name=None):
+        # URLs with multiple parameters are not tested automatically
+        if resource[1]['params'] and len(resource[1]['params']) > 1:
+            return None
+
+        if test_name is None:
+            test_name = self.auto_test_name(api)
+
         # Test URLs which include a {resourceId} or similar parameter
-        if resource[1]['params'] and len(resource[1]['params']) == 1:
-            path = resource[0].split("{")[0].rstrip("/")
+        if resource[1]['params']:
+            path = resource[0].split("{", 1)[0].rstrip("/")
             if path in self.saved_entities:
                 # Pick the first relevant saved entity and construct a test
                 entity = self.saved_entities[path][0]
                 params = {resource[1]['params'][0].name: entity}
                 url_param = resource[0].format(**params)
-                url = "{}{}".format(self.apis[api]["url"].rstrip("/"), url_param)
-                test = Test("{} /x-nmos/{}/{}{}".format(resource[1]['method'].upper(),
-                                                        api,
-                                                        self.apis[api]["version"],
-                                                        url_param), self.auto_test_name(api))
+                url = self.apis[api]["url_prefix"] + url_param
+                test = Test("{} {}{}".format(resource[1]['method'].upper(),
+                                             self.apis[api]["test_path_prefix"],
+                                             url_param), test_name)
             else:
                 # There were no saved entities found, so we can't test this parameterised URL
-                test = Test("{} /x-nmos/{}/{}{}".format(resource[1]['method'].upper(),
-                                                        api,
-                                                        self.apis[api]["version"],
-                                                        resource[0].rstrip("/")), self.auto_test_name(api))
+                test = Test("{} {}{}".format(resource[1]['method'].upper(),
+                                             self.apis[api]["test_path_prefix"],
+                                             resource[0].rstrip("/")), test_name)
                 return test.UNCLEAR("No resources found to perform this test")
 
         # Test general URLs with no parameters
-        elif not resource[1]['params']:
-            url = "{}{}".format(self.apis[api]["url"].rstrip("/"), resource[0].rstrip("/"))
-            test = Test("{} /x-nmos/{}/{}{}".format(resource[1]['method'].upper(),
-                                                    api,
-                                                    self.apis[api]["version"],
-                                                    resource[0].rstrip("/")), self.auto_test_name(api))
         else:
-            return None
+            url = self.apis[api]["url_prefix"] + resource[0].rstrip("/")
+            test = Test("{} {}{}".format(resource[1]['method'].upper(),
+                                         self.apis[api]["test_path_prefix"],
+                                         resource[0].rstrip("/")), test_name)
 
         headers = None
         cors_methods = None
@@ -492,10 +587,15 @@ class GenericTest(object):
 
     def save_subresources(self, path, response):
         """Get IDs contained within an array JSON response such that they can be interrogated individually"""
+        # Responses to methods such as HEAD and OPTIONS have no payload to search
+        if not response.content:
+            return
+
         subresources = list()
         try:
-            if isinstance(response.json(), list):
-                for entry in response.json():
+            response_json = orjson.loads(response.content)
+            if isinstance(response_json, list):
+                for entry in response_json:
                     # In general, lists return fully fledged objects which each have an ID
                     if isinstance(entry, dict) and "id" in entry:
                         subresources.append(entry["id"])
@@ -503,19 +603,20 @@ class GenericTest(object):
                     elif isinstance(entry, str) and entry.endswith("/"):
                         res_id = entry.rstrip("/")
                         subresources.append(res_id)
-            elif isinstance(response.json(), dict):
-                for key, value in response.json().items():
+            elif isinstance(response_json, dict):
+                for key, value in response_json.items():
                     # Cover the audio channel mapping spec case with dictionary keys
                     if isinstance(key, str) and isinstance(value, dict):
                         subresources.append(key)
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             pass
 
         if len(subresources) > 0:
-            if path not in self.saved_entities:
-                self.saved_entities[path] = subresources
-            else:
-                self.saved_entities[path] += subresources
+            with self.saved_entities_lock:
+                if path not in self.saved_entities:
+                    self.saved_entities[path] = subresources
+                else:
+                    self.saved_entities[path] += subresources
 
     def get_schema(self, api_name, method, path, status_code):
         return self.apis[api_name]["spec"].get_schema(method, path, status_code)
@@ -16,6 +16,7 @@
 
 import re
 import time
+import orjson
 
 from random import randint
 from . import TestHelper
@@ -132,6 +133,31 @@ class IS05Utils(NMOSUtils):
             data["master_enable"] = masterEnable
         return self.checkCleanRequestJSON("PATCH", stagedUrl, data=data, code=code)
 
+    def perform_bulk_activation(self, port, portIds, activateMode=IMMEDIATE_ACTIVATION, activateTime=None,
+                                masterEnable=None):
+        # Request the same activation of several ports at once via the bulk interface
+        bulkUrl = "bulk/" + port + "s"
+        params = {"activation": {"mode": activateMode}}
+        code = 200
+        if activateMode != IMMEDIATE_ACTIVATION:
+            params["activation"]["requested_time"] = activateTime
+            code = 202
+        if masterEnable is not None:
+            params["master_enable"] = masterEnable
+        data = [{"id": portId, "params": params} for portId in portIds]
+        valid, response = self.checkCleanRequestJSON("POST", bulkUrl, data=data)
+        if valid:
+            try:
+                if len(response) != len(portIds):
+                    return False, "Expected {} results from {}, got {}".format(len(portIds), bulkUrl, len(response))
+                for result in response:
+                    if result["code"] != code:
+                        return False, "Expected status code {} for {} {} from {}, got {}" \
+                                      .format(code, port, result["id"], bulkUrl, result["code"])
+            except (KeyError, TypeError):
+                return False, "Invalid response received from {}: {}".format(bulkUrl, response)
+        return valid, response
+
     def check_perform_immediate_activation(self, port, portId, stagedParams, changedParam):
         # Request an immediate activation
         stagedUrl = "single/" + port + "s/" + portId + "/staged"
@@ -813,7 +839,7 @@ class IS05Utils(NMOSUtils):
         valid, response = self.checkCleanRequest(method, dest, data, code)
         if valid:
             try:
-                return True, response.json()
+                return True, orjson.loads(response.content)
             except Exception:
                 # Failed parsing JSON
                 return False, "Invalid JSON received"
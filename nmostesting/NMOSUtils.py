@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import time
+import bisect
 import functools
 from urllib.parse import urlparse
 from random import sample
@@ -57,6 +58,10 @@ UTC_LEAP = [
     (63072000, 63072009),  # 1 Jan 1972, 10 leap seconds
 ]
 
+# Ascending copy of the table above, with its UTC seconds extracted for bisection
+UTC_LEAP_ASCENDING = sorted(UTC_LEAP)
+UTC_LEAP_SECS = [tbl_sec for tbl_sec, _ in UTC_LEAP_ASCENDING]
+
 DEFAULT_ARGS = {
     "list_suites": False,
     "describe_suites": False,
@@ -80,10 +85,10 @@ class NMOSUtils(object):
     def from_UTC(secs, nanos, is_leap=False):
         """Convert a UTC time into a TAI time"""
         leap_sec = 0
-        for tbl_sec, tbl_tai_sec_minus_1 in UTC_LEAP:
-            if secs >= tbl_sec:
-                leap_sec = (tbl_tai_sec_minus_1 + 1) - tbl_sec
-                break
+        index = bisect.bisect_right(UTC_LEAP_SECS, secs) - 1
+        if index >= 0:
+            tbl_sec, tbl_tai_sec_minus_1 = UTC_LEAP_ASCENDING[index]
+            leap_sec = (tbl_tai_sec_minus_1 + 1) - tbl_sec
         return secs + leap_sec + is_leap, nanos
 
     @staticmethod
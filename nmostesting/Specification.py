@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import os
+import jsonref
 import ramlfications
 
 from .Patches import _parse_json
@@ -29,6 +30,13 @@ class Specification(object):
     def __init__(self, file_path):
         self.data = {}
         self.global_schemas = {}
+        self.schema_lookups = {}
+
+        # Base of the specification repository, which schemas are resolved relative to
+        self.spec_path = os.path.dirname(os.path.dirname(file_path))
+
+        # Referenced schema files are read once per Specification, after the spec branch has been checked out
+        self.schema_loader = jsonref.JsonLoader(cache_results=True)
 
         self._fix_schemas(file_path)
         api_raml = ramlfications.parse(file_path, "config.ini")
@@ -39,7 +47,7 @@ class Specification(object):
         for resource in api_raml.resources:
             resource_data = {'method': resource.method,
                              'params': resource.uri_params,
-                             'body': self._extract_body_schema(resource, file_path),
+                             'body': self._extract_body_schema(resource),
                              'responses': {}}
 
             # Add a list for the resource path if we don't have one yet
@@ -50,7 +58,7 @@ class Specification(object):
             for response in resource.responses:
                 # Note: Must check we don't overwrite an existing schema here by checking if it is None or not
                 if response.code not in resource_data["responses"] or resource_data["responses"][response.code] is None:
-                    resource_data["responses"][response.code] = self._extract_response_schema(response, file_path)
+                    resource_data["responses"][response.code] = self._extract_response_schema(response)
 
             # Register the collected data in the Specification object
             self.data[resource.path].append(resource_data)
@@ -114,19 +122,17 @@ class Specification(object):
                 keys = list(schema.keys())
                 self.global_schemas[keys[0]] = schema[keys[0]]
 
-    def _extract_body_schema(self, resource, file_path):
+    def _extract_body_schema(self, resource):
         """Locate the schema for the request body if one exists"""
         body_schema = None
         if resource.body is not None:
             for attr in resource.body:
                 if attr.mime_type == "schema":
-                    apis_path = os.path.dirname(file_path)
-                    spec_path = os.path.dirname(apis_path)
-                    body_schema = load_resolved_schema(spec_path, schema_obj=attr.raw)
+                    body_schema = load_resolved_schema(self.spec_path, schema_obj=attr.raw, loader=self.schema_loader)
                     break
         return body_schema
 
-    def _extract_response_schema(self, response, file_path):
+    def _extract_response_schema(self, response):
         """Find schemas defined for a given API response and return the schema object"""
         schema_loc = None
         if not response.body:
@@ -142,20 +148,26 @@ class Specification(object):
                     if "type" in entry.raw:
                         schema_loc = entry.raw["type"]
 
-        apis_path = os.path.dirname(file_path)
-        spec_path = os.path.dirname(apis_path)
         if isinstance(schema_loc, dict):
-            return load_resolved_schema(spec_path, schema_obj=schema_loc)
+            return load_resolved_schema(self.spec_path, schema_obj=schema_loc, loader=self.schema_loader)
         elif schema_loc in self.global_schemas and self.global_schemas[schema_loc] is not None:
-            return load_resolved_schema(spec_path, schema_obj=self.global_schemas[schema_loc])
+            return load_resolved_schema(self.spec_path, schema_obj=self.global_schemas[schema_loc],
+                                        loader=self.schema_loader)
         else:
             return None
 
     def get_schema(self, method, path, response_code):
         """Get the response schema for a given method, path and response code if available"""
+        key = (method.upper(), path, response_code)
+        if key not in self.schema_lookups:
+            self.schema_lookups[key] = self._find_schema(*key)
+        return self.schema_lookups[key]
+
+    def _find_schema(self, method, path, response_code):
+        """Search the parsed API data for the response schema for a given method, path and response code"""
         if path in self.data:
             for response in self.data[path]:
-                if response["method"].upper() == method.upper():
+                if response["method"].upper() == method:
                     if response["responses"][response_code]:
                         return response["responses"][response_code]
         return None
@@ -16,15 +16,24 @@
 
 import threading
 import requests
+import http.cookiejar
+from requests.adapters import HTTPAdapter
 import websocket
 import os
 import jsonref
 import netifaces
-from copy import copy
+from collections import deque
 from pathlib import Path
 
 from . import Config as CONFIG
 
+# A single Session is shared by all requests so that TCP/TLS connections to the APIs under test can be reused.
+# Cookies are rejected to ensure no state carries over between otherwise independent requests.
+_session = requests.Session()
+_session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+_session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
+_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
+
 
 def ordered(obj):
     if isinstance(obj, dict):
@@ -57,18 +66,14 @@ def get_default_ip():
 def do_request(method, url, **kwargs):
     """Perform a basic HTTP request with appropriate error handling"""
     try:
-        s = requests.Session()
-        req = requests.Request(method, url, **kwargs)
-        prepped = s.prepare_request(req)
-        settings = s.merge_environment_settings(prepped.url, {}, None, CONFIG.CERT_TRUST_ROOT_CA, None)
-        response = s.send(prepped, timeout=CONFIG.HTTP_TIMEOUT, **settings)
-        if prepped.url.startswith("https://"):
-            if not response.url.startswith("https://"):
-                return False, "Redirect changed protocol"
-            if response.history is not None:
-                for res in response.history:
-                    if not res.url.startswith("https://"):
-                        return False, "Redirect changed protocol"
+        response = _session.request(method, url, timeout=CONFIG.HTTP_TIMEOUT, verify=CONFIG.CERT_TRUST_ROOT_CA,
+                                    **kwargs)
+        # The first URL is the one originally requested, followed by those of any redirects
+        urls = [res.url for res in response.history] + [response.url]
+        if urls[0].startswith("https://"):
+            for redirect_url in urls[1:]:
+                if not redirect_url.startswith("https://"):
+                    return False, "Redirect changed protocol"
         return True, response
     except requests.exceptions.Timeout:
         return False, "Connection timeout"
@@ -80,10 +85,11 @@ def do_request(method, url, **kwargs):
         return False, str(e)
 
 
-def load_resolved_schema(spec_path, file_name=None, schema_obj=None, path_prefix=True):
+def load_resolved_schema(spec_path, file_name=None, schema_obj=None, path_prefix=True, loader=None):
     """
     Parses JSON as well as resolves any `$ref`s, including references to
     local files and remote (HTTP/S) files.
+    A jsonref loader may be provided in order to share its cache of referenced files between calls.
     """
 
     # Only one of file_name or schema_obj must be set
@@ -99,7 +105,8 @@ def load_resolved_schema(spec_path, file_name=None, schema_obj=None, path_prefix
     else:
         base_uri_path = "file://" + base_path
 
-    loader = jsonref.JsonLoader(cache_results=False)
+    if loader is None:
+        loader = jsonref.JsonLoader(cache_results=False)
 
     if file_name:
         json_file = str(Path(base_path) / file_name)
@@ -135,27 +142,37 @@ class WebsocketWorker(threading.Thread):
             print(" * ERROR: You have the wrong Python websocket module installed. "
                   "Please uninstall 'websocket' and install 'websocket-client'")
             raise
-        self.messages = list()
+        # Messages are appended by the WebSocket thread and consumed by the test thread
+        self.messages = deque()
         self.error_occured = False
         self.connected = False
         self.error_message = ""
 
+        # Events which allow other threads to wait for changes in the connection state and incoming messages
+        self.open_event = threading.Event()
+        self.close_event = threading.Event()
+        self.message_event = threading.Event()
+
     def run(self):
         self.ws.run_forever(sslopt={"ca_certs": CONFIG.CERT_TRUST_ROOT_CA})
 
     def on_open(self):
         self.connected = True
+        self.open_event.set()
 
     def on_message(self, message):
         self.messages.append(message)
+        self.message_event.set()
 
     def on_close(self):
         self.connected = False
+        self.close_event.set()
 
     def on_error(self, error):
         self.error_occured = True
         self.error_message = error
         self.connected = False
+        self.close_event.set()
 
     def close(self):
         self.ws.close()
@@ -168,9 +185,12 @@ class WebsocketWorker(threading.Thread):
         return self.connected
 
     def get_messages(self):
-        msg_cpy = copy(self.messages)
-        self.clear_messages()  # Reset message list after reading
-        return msg_cpy
+        # Drain the received messages one at a time so that any arriving meanwhile are not lost
+        self.message_event.clear()
+        messages = []
+        while self.messages:
+            messages.append(self.messages.popleft())
+        return messages
 
     def did_error_occur(self):
         return self.error_occured
@@ -179,4 +199,5 @@ class WebsocketWorker(threading.Thread):
         return self.error_message
 
     def clear_messages(self):
+        self.message_event.clear()
         self.messages.clear()
@@ -14,7 +14,10 @@
 
 import re
 import time
-import json
+import orjson
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 from .. import Config as CONFIG
 from ..GenericTest import GenericTest, NMOSTestException
@@ -34,6 +37,13 @@ WS_HEARTBEAT_INTERVAL = 5
 # Number of seconds without heartbeats before an IS-07 WebSocket Sender closes a connection
 WS_TIMEOUT = 12
 
+# Recommended convention for the 'broker_topic' of IS-07 MQTT Senders, capturing the API version and Source ID
+BROKER_TOPIC_PATTERN = re.compile(r"^x-nmos/events/([^/]+)/sources/(.+)$")
+
+# Required 'ext_' transport parameters of IS-07 WebSocket and MQTT Senders
+EXT_PARAMS_WEBSOCKET = frozenset(["ext_is_07_source_id", "ext_is_07_rest_api_url"])
+EXT_PARAMS_MQTT = frozenset(["ext_is_07_rest_api_url"])
+
 
 class IS0702Test(GenericTest):
     """
@@ -53,15 +63,24 @@ class IS0702Test(GenericTest):
         self.is07_utils = IS07Utils(self.events_url)
 
     def set_up_tests(self):
-        self.is05_senders = self.is05_utils.get_senders()
-        self.is07_sources = self.is07_utils.get_sources_states_and_types()
-        self.is04_sources = self.is04_utils.get_sources()
-        self.is04_flows = self.is04_utils.get_flows()
-        self.is04_senders = self.is04_utils.get_senders()
+        # The resources are independent of each other, so are requested concurrently
+        with ThreadPoolExecutor(max_workers=CONFIG.MAX_CONCURRENT_REQUESTS) as executor:
+            is05_senders = executor.submit(self.is05_utils.get_senders)
+            is07_sources = executor.submit(self.is07_utils.get_sources_states_and_types)
+            is04_sources = executor.submit(self.is04_utils.get_sources)
+            is04_flows = executor.submit(self.is04_utils.get_flows)
+            is04_senders = executor.submit(self.is04_utils.get_senders)
+        self.is05_senders = is05_senders.result()
+        self.is07_sources = is07_sources.result()
+        self.is04_sources = is04_sources.result()
+        self.is04_flows = is04_flows.result()
+        self.is04_senders = is04_senders.result()
         self.transport_types = {}
         self.senders_active = {}
         self.senders_to_test = {}
         self.sources_to_test = {}
+        self.senders_by_source = {}
+        self.websocket_senders_by_source = {}
 
         for sender in self.is04_senders:
             flow = self.is04_senders[sender]["flow_id"]
@@ -71,17 +90,20 @@ class IS0702Test(GenericTest):
                     if 'event_type' in self.is04_sources[source]:
                         self.senders_to_test[sender] = self.is04_senders[sender]
                         self.sources_to_test[source] = self.is04_sources[source]
+                        self.senders_by_source.setdefault(source, []).append(self.is04_senders[sender])
+                        if self.is04_senders[sender].get("transport") == "urn:x-nmos:transport:websocket":
+                            self.websocket_senders_by_source.setdefault(source, []).append(self.is04_senders[sender])
 
+        # The transport_type of each Sender is only exposed from IS-05 v1.1 onwards
+        has_transport_type = self.is05_utils.compare_api_version(self.apis[CONN_API_KEY]["version"], "v1.1") >= 0
         for sender in self.is05_senders:
-            if self.is05_utils.compare_api_version(self.apis[CONN_API_KEY]["version"], "v1.1") >= 0:
+            if has_transport_type:
                 self.transport_types[sender] = self.is05_utils.get_transporttype(sender, "sender")
             else:
                 self.transport_types[sender] = "urn:x-nmos:transport:rtp"
 
         if len(self.is05_senders) > 0:
-            for sender in self.is05_senders:
-                dest = "single/senders/" + sender + "/active"
-                valid, response = self.is05_utils.checkCleanRequestJSON("GET", dest)
+            for sender, (valid, response) in zip(self.is05_senders, self.get_active_params(self.is05_senders)):
                 if valid:
                     if len(response) > 0 and isinstance(response["transport_params"][0], dict):
                         self.senders_active[sender] = response
@@ -89,19 +111,17 @@ class IS0702Test(GenericTest):
     def test_01(self, test):
         """Each IS-05 Sender has the required ext parameters"""
 
-        ext_params_websocket = ['ext_is_07_source_id', 'ext_is_07_rest_api_url']
-        ext_params_mqtt = ['ext_is_07_rest_api_url']
         if len(self.senders_to_test.keys()) > 0:
             for sender in self.senders_to_test:
                 if sender in self.senders_active:
                     all_params = self.senders_active[sender]["transport_params"][0].keys()
-                    params = [param for param in all_params if param.startswith("ext_")]
+                    params = {param for param in all_params if param.startswith("ext_")}
                     valid_params = False
                     if self.transport_types[sender] == "urn:x-nmos:transport:websocket":
-                        if sorted(params) == sorted(ext_params_websocket):
+                        if params == EXT_PARAMS_WEBSOCKET:
                             valid_params = True
                     elif self.transport_types[sender] == "urn:x-nmos:transport:mqtt":
-                        if sorted(params) == sorted(ext_params_mqtt):
+                        if params == EXT_PARAMS_MQTT:
                             valid_params = True
                     if not valid_params:
                         return test.FAIL("Missing required ext parameters for Sender {}".format(sender))
@@ -132,15 +152,10 @@ class IS0702Test(GenericTest):
                     except KeyError as e:
                         return test.FAIL("Source {} does not contain expected key: {}"
                                          .format(found_source["id"], e))
-                    found_sender = None
-                    for sender_id in self.senders_to_test:
-                        flow_id = self.senders_to_test[sender_id]["flow_id"]
-                        if flow_id in self.is04_flows:
-                            if source_id == self.is04_flows[flow_id]["source_id"]:
-                                found_flow = self.is04_flows[flow_id]
-                                found_sender = self.senders_to_test[sender_id]
-                                break
-                    if found_sender is not None:
+                    found_senders = self.senders_by_source.get(source_id)
+                    if found_senders:
+                        found_sender = found_senders[0]
+                        found_flow = self.is04_flows[found_sender["flow_id"]]
                         try:
                             if found_flow["format"] != "urn:x-nmos:format:data":
                                 return test.FAIL("Flow {} specifies an unsupported format: {}"
@@ -158,13 +173,14 @@ class IS0702Test(GenericTest):
                         if found_sender["id"] in self.senders_active:
                             try:
                                 params = self.senders_active[found_sender["id"]]["transport_params"][0]
-                                if found_sender["transport"] == "urn:x-nmos:transport:websocket":
+                                transport = found_sender["transport"]
+                                if transport == "urn:x-nmos:transport:websocket":
                                     if params["ext_is_07_source_id"] != source_id:
                                         return test.FAIL("IS-05 sender {} does not indicate the correct "
                                                          "'ext_is_07_source_id': {}"
                                                          .format(found_sender["id"], source_id))
-                                elif found_sender["transport"] == "urn:x-nmos:transport:mqtt":
-                                    topic = re.search("^x-nmos/events/(.+)/sources/(.+)$", params["broker_topic"])
+                                elif transport == "urn:x-nmos:transport:mqtt":
+                                    topic = BROKER_TOPIC_PATTERN.match(params["broker_topic"])
                                     if not topic:
                                         warn_topic = True
                                         warn_message = "IS-05 sender {} does not follow the recommended convention " \
@@ -179,7 +195,7 @@ class IS0702Test(GenericTest):
                                             "in 'broker_topic': {}".format(found_sender["id"], api["version"])
                                 else:
                                     return test.FAIL("IS-05 sender {} has an unsupported transport {}"
-                                                     .format(found_sender["id"], found_sender["transport"]))
+                                                     .format(found_sender["id"], transport))
                             except KeyError as e:
                                 return test.FAIL("Sender {} parameters do not contain expected key: {}"
                                                  .format(found_sender["id"], e))
@@ -204,22 +220,10 @@ class IS0702Test(GenericTest):
 
         if len(self.is07_sources) > 0:
             found_senders = False
-            senders_by_device = {}
+            senders_by_device = defaultdict(dict)
             for source_id in self.is07_sources:
-                if source_id in self.sources_to_test:
-                    for sender_id in self.senders_to_test:
-                        flow_id = self.senders_to_test[sender_id]["flow_id"]
-                        if flow_id in self.is04_flows:
-                            if source_id == self.is04_flows[flow_id]["source_id"]:
-                                found_sender = self.senders_to_test[sender_id]
-                                if found_sender["transport"] == "urn:x-nmos:transport:websocket":
-                                    if found_sender["device_id"] not in senders_by_device:
-                                        senders_dict = {}
-                                        senders_dict[found_sender["id"]] = found_sender
-                                        senders_by_device[found_sender["device_id"]] = senders_dict
-                                    else:
-                                        senders_dict = senders_by_device[found_sender["device_id"]]
-                                        senders_dict[found_sender["id"]] = found_sender
+                for found_sender in self.websocket_senders_by_source.get(source_id, []):
+                    senders_by_device[found_sender["device_id"]][found_sender["id"]] = found_sender
 
             for device_id in senders_by_device:
                 device_connection_uri = None
@@ -227,10 +231,10 @@ class IS0702Test(GenericTest):
                 senders_dict = senders_by_device[device_id]
                 for sender_id in senders_dict:
                     found_sender = senders_dict[sender_id]
-                    if found_sender["id"] in self.senders_active:
+                    if sender_id in self.senders_active:
                         found_senders = True
                         try:
-                            params = self.senders_active[found_sender["id"]]["transport_params"][0]
+                            params = self.senders_active[sender_id]["transport_params"][0]
                             sender_connection_uri = params["connection_uri"]
                             sender_connection_authorization = params["connection_authorization"]
 
@@ -281,12 +285,9 @@ class IS0702Test(GenericTest):
 
             # Give each WebSocket client a chance to start and open its connection
             start_time = time.time()
-            while time.time() < start_time + CONFIG.WS_MESSAGE_TIMEOUT:
-                no_health_opened = all([websockets_no_health[_].is_open() for _ in websockets_no_health])
-                with_health_opened = all([websockets_with_health[_].is_open() for _ in websockets_with_health])
-                if no_health_opened and with_health_opened:
-                    break
-                time.sleep(0.2)
+            self.wait_for_all([websocket.open_event for websocket in websockets_no_health.values()] +
+                              [websocket.open_event for websocket in websockets_with_health.values()],
+                              start_time + CONFIG.WS_MESSAGE_TIMEOUT)
 
             # After that short while, they must all be connected successfully
             for websockets in [websockets_no_health, websockets_with_health]:
@@ -299,27 +300,23 @@ class IS0702Test(GenericTest):
                         return test.FAIL("Error opening WebSocket connection to {}".format(connection_uri))
 
             # All WebSocket connections must stay open until a health command is required
-            while time.time() < start_time + WS_HEARTBEAT_INTERVAL:
-                for websockets in [websockets_no_health, websockets_with_health]:
-                    for connection_uri in websockets:
-                        websocket = websockets[connection_uri]
-                        if not websocket.is_open():
-                            return test.FAIL("WebSocket connection to {} was closed too early".format(connection_uri))
-                time.sleep(1)
+            for websockets in [websockets_no_health, websockets_with_health]:
+                connection_uri = self.wait_for_any_closed(websockets, start_time + WS_HEARTBEAT_INTERVAL)
+                if connection_uri is not None:
+                    return test.FAIL("WebSocket connection to {} was closed too early".format(connection_uri))
 
             # send health commands to one set of WebSockets
             health_command = {}
             health_command["command"] = "health"
             health_command["timestamp"] = self.is04_utils.get_TAI_time()
 
+            health_message = orjson.dumps(health_command).decode("utf-8")
             for connection_uri in websockets_with_health:
-                websockets_with_health[connection_uri].send(json.dumps(health_command))
+                websockets_with_health[connection_uri].send(health_message)
 
             # All WebSocket connections which were sent a health command should respond with a health response
-            while time.time() < start_time + WS_HEARTBEAT_INTERVAL * 2:
-                if all([len(websockets_with_health[_].messages) >= 1 for _ in websockets_with_health]):
-                    break
-                time.sleep(0.2)
+            self.wait_for_all([websocket.message_event for websocket in websockets_with_health.values()],
+                              start_time + WS_HEARTBEAT_INTERVAL * 2)
 
             for connection_uri in websockets_with_health:
                 websocket = websockets_with_health[connection_uri]
@@ -332,7 +329,7 @@ class IS0702Test(GenericTest):
                                      "to the health command".format(connection_uri))
                 elif len(messages) == 1:
                     try:
-                        message = json.loads(messages[0])
+                        message = orjson.loads(messages[0])
                         if "message_type" in message:
                             if message["message_type"] != "health":
                                 return test.FAIL("WebSocket {} health response message_type is not "
@@ -370,25 +367,20 @@ class IS0702Test(GenericTest):
 
             # All WebSocket connections which haven't been sent a health command must stay opened
             # for a period of time even without any heartbeats
-            while time.time() < start_time + WS_TIMEOUT - 1:
-                for connection_uri in websockets_no_health:
-                    websocket = websockets_no_health[connection_uri]
-                    if not websocket.is_open():
-                        return test.FAIL("WebSocket connection (no health cmd sent) to {} was closed too early"
-                                         .format(connection_uri))
-                time.sleep(1)
+            connection_uri = self.wait_for_any_closed(websockets_no_health, start_time + WS_TIMEOUT - 1)
+            if connection_uri is not None:
+                return test.FAIL("WebSocket connection (no health cmd sent) to {} was closed too early"
+                                 .format(connection_uri))
 
             # A short while after that timeout period, and certainly before another IS-07 heartbeat
             # interval has passed, all WebSocket connections which haven't been sent a health command
             # should start being closed down and connections which have been sent a health command
             # should still remain opened
-            while time.time() < start_time + WS_TIMEOUT + WS_HEARTBEAT_INTERVAL:
-                for connection_uri in websockets_with_health:
-                    websocket = websockets_with_health[connection_uri]
-                    if not websocket.is_open():
-                        return test.FAIL("WebSocket connection (health cmd sent) to {} was closed too early"
-                                         .format(connection_uri))
-                time.sleep(1)
+            connection_uri = self.wait_for_any_closed(websockets_with_health,
+                                                      start_time + WS_TIMEOUT + WS_HEARTBEAT_INTERVAL)
+            if connection_uri is not None:
+                return test.FAIL("WebSocket connection (health cmd sent) to {} was closed too early"
+                                 .format(connection_uri))
 
             # Now, all WebSocket connections which haven't been sent a health command must all be disconnected
             for connection_uri in websockets_no_health:
@@ -398,10 +390,8 @@ class IS0702Test(GenericTest):
                                      .format(connection_uri))
 
             # WebSocket connections which have been sent a health command should start being closed down now
-            while time.time() < start_time + WS_TIMEOUT + WS_HEARTBEAT_INTERVAL * 2:
-                if all([not websockets_with_health[_].is_open() for _ in websockets_with_health]):
-                    break
-                time.sleep(0.2)
+            self.wait_for_all([websocket.close_event for websocket in websockets_with_health.values()],
+                              start_time + WS_TIMEOUT + WS_HEARTBEAT_INTERVAL * 2)
 
             # Now, they must all be disconnected
             for connection_uri in websockets_with_health:
@@ -414,35 +404,69 @@ class IS0702Test(GenericTest):
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
+    def wait_for_all(self, events, deadline):
+        """Wait until all of the given events are set, or until the deadline (a time.time() value) has passed"""
+        for event in events:
+            if not event.wait(max(deadline - time.time(), 0)):
+                return False
+        return True
+
+    def wait_for_any_closed(self, websockets, deadline):
+        """
+        Wait until the deadline (a time.time() value) has passed, checking that the WebSocket connections stay open.
+        Returns the connection URI of a connection which closed, or None if they all stayed open.
+        """
+        for connection_uri, websocket in websockets.items():
+            if websocket.close_event.wait(max(deadline - time.time(), 0)):
+                return connection_uri
+        return None
+
+    def get_active_params(self, sender_ids):
+        """Returns a list of (valid, response) results of concurrent GETs of each IS-05 Sender's /active endpoint"""
+        with ThreadPoolExecutor(max_workers=CONFIG.MAX_CONCURRENT_REQUESTS) as executor:
+            return list(executor.map(lambda sender_id: self.is05_utils.checkCleanRequestJSON(
+                "GET", "single/senders/" + sender_id + "/active"), sender_ids))
+
+    def enable_senders(self, test, sender_ids):
+        """Sets master_enable on each of the given IS-05 Senders, updating their active parameters"""
+        valid, response = self.is05_utils.perform_bulk_activation("sender", sender_ids, masterEnable=True)
+        if valid:
+            for sender_id, (valid, response) in zip(sender_ids, self.get_active_params(sender_ids)):
+                if valid:
+                    self.senders_active[sender_id] = response
+                else:
+                    raise NMOSTestException(test.FAIL(response))
+        else:
+            # Fall back to activating each Sender individually
+            for sender_id in sender_ids:
+                valid, response = self.is05_utils.perform_activation("sender", sender_id, masterEnable=True)
+                if valid:
+                    self.senders_active[sender_id] = response
+                else:
+                    raise NMOSTestException(test.FAIL(response))
+
     def get_websocket_connection_sources(self, test):
         """Returns a dictionary of WebSocket sources available for connection"""
         connection_sources = {}
 
-        if len(self.is07_sources) > 0:
-            for source_id in self.is07_sources:
-                if source_id in self.sources_to_test:
-                    for sender_id in self.senders_to_test:
-                        flow_id = self.senders_to_test[sender_id]["flow_id"]
-                        if flow_id in self.is04_flows:
-                            if source_id == self.is04_flows[flow_id]["source_id"]:
-                                found_sender = self.senders_to_test[sender_id]
-                                if found_sender["transport"] == "urn:x-nmos:transport:websocket":
-                                    if sender_id in self.senders_active:
-                                        if not self.senders_active[sender_id]["master_enable"]:
-                                            valid, response = self.is05_utils.perform_activation("sender", sender_id,
-                                                                                                 masterEnable=True)
-                                            if valid:
-                                                self.senders_active[sender_id] = response
-                                            else:
-                                                raise NMOSTestException(test.FAIL(response))
-                                        params = self.senders_active[sender_id]["transport_params"][0]
-                                        if "connection_uri" not in params:
-                                            raise NMOSTestException(test.FAIL("Sender {} has no connection_uri "
-                                                                    "parameter".format(sender_id)))
-                                        connection_uri = params["connection_uri"]
-                                        if connection_uri not in connection_sources:
-                                            connection_sources[connection_uri] = [source_id]
-                                        else:
-                                            connection_sources[connection_uri].append(source_id)
+        # Only Sources with an event_type are indexed in websocket_senders_by_source, so no separate check is needed
+        websocket_senders = []
+        for source_id in self.is07_sources:
+            for found_sender in self.websocket_senders_by_source.get(source_id, []):
+                if found_sender["id"] in self.senders_active:
+                    websocket_senders.append((source_id, found_sender["id"]))
+
+        # Any Senders which aren't already enabled are enabled together
+        disabled_senders = [sender_id for _, sender_id in websocket_senders
+                            if not self.senders_active[sender_id]["master_enable"]]
+        if len(disabled_senders) > 0:
+            self.enable_senders(test, disabled_senders)
+
+        for source_id, sender_id in websocket_senders:
+            params = self.senders_active[sender_id]["transport_params"][0]
+            if "connection_uri" not in params:
+                raise NMOSTestException(test.FAIL("Sender {} has no connection_uri "
+                                        "parameter".format(sender_id)))
+            connection_sources.setdefault(params["connection_uri"], []).append(source_id)
 
         return connection_sources